@@ -11,6 +11,7 @@ import datetime
 import logging
 import os
 import platform
+import re
 import subprocess
 import time
 import webbrowser
@@ -25,6 +26,9 @@ import pandas as pd
 
 logger = logging.getLogger("sit_botex")
 
+# Round indicator in task prompts, compiled once rather than per message
+ROUND_PATTERN = re.compile(r'Round (\d+)')
+
 
 def configure_tinyllama_params(args, user_prompts):
     """Configure parameters for TinyLLaMA bots to be used with run_bots_on_session"""
@@ -72,22 +76,15 @@ def remove_redundant_otree_builtin_fields(csv_file_path):
             field_columns = [col for col in df.columns if col.endswith(f'.player.{field}')]
             
             if len(field_columns) > 1:
-                # Check if all columns have identical values
+                # Check if all columns have identical values, comparing whole columns at once
+                # rather than cell by cell (NaN in both cells counts as identical)
                 first_col = field_columns[0]
-                is_invariant = True
+                first_values = df[first_col]
+                other_values = df[field_columns[1:]]
                 
-                for participant_row in range(len(df)):
-                    first_value = df.loc[participant_row, first_col]
-                    
-                    for col_name in field_columns[1:]:
-                        if df.loc[participant_row, col_name] != first_value:
-                            # Handle NaN comparisons
-                            if not (pd.isna(first_value) and pd.isna(df.loc[participant_row, col_name])):
-                                is_invariant = False
-                                break
-                    
-                    if not is_invariant:
-                        break
+                equal = other_values.eq(first_values, axis=0).to_numpy()
+                both_nan = other_values.isna().to_numpy() & first_values.isna().to_numpy()[:, None]
+                is_invariant = bool((equal | both_nan).all())
                 
                 if is_invariant:
                     # Keep only the first column, rename it to remove round number
@@ -154,8 +151,7 @@ def export_response_data(csv_file, botex_db, session_id):
                         prompt_content = message.get('content', '')
                         
                         # Look for round indicators in the prompt
-                        import re
-                        round_match = re.search(r'Round (\d+)', prompt_content)
+                        round_match = ROUND_PATTERN.search(prompt_content)
                         if round_match:
                             detected_round = int(round_match.group(1))
                             current_round = detected_round
@@ -533,12 +533,8 @@ class DASS3(Page):
 class AQ(Page):
     """Autism Quotient-10"""
     form_model = 'player'
-    
-    @staticmethod
-    def get_form_fields(player):
-        aq_fields = [f'aq_{idx}' for idx in range(1, C.NUM_AQ_QUESTIONS + 1)]
-        check_fields = ['aq_check_1', 'aq_check_2', 'aq_check_3']
-        return aq_fields + check_fields
+    # Field list is the same for every player, so build it once rather than on each render
+    form_fields = [f'aq_{idx}' for idx in range(1, C.NUM_AQ_QUESTIONS + 1)] + ['aq_check_1', 'aq_check_2', 'aq_check_3']
     
     @staticmethod
     def before_next_page(player, timeout_happened):
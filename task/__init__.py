@@ -1,8 +1,7 @@
 from otree.api import *
-import random
-import csv
+import json
 import os
-from itertools import cycle
+from collections import Counter
 
 author = 'Aamir Sohail'
 
@@ -28,10 +27,14 @@ class C(BaseConstants):
     
     # Reversal points
     REVERSAL_ROUNDS = [16, 33, 48]
+    
+    # Scoring
+    POINTS_PER_BET = 20           # Points won or lost per unit bet
+    BONUS_POINTS_DIVISOR = 600    # Bonus points converted to payoff currency
 
-# Hardcoded reward sequence for each round: [(A_reward, B_reward), ...]
+# Hardcoded reward sequence for each round: ((A_reward, B_reward), ...), stored as an immutable tuple
 # Same as before - sequence of 64 rounds defining which option is rewarded in each round
-REWARD_SEQUENCE = [
+REWARD_SEQUENCE = (
     (1, 0),  # Round 1
     (1, 0),  # Round 2
     (1, 0),  # Round 3
@@ -96,15 +99,57 @@ REWARD_SEQUENCE = [
     (0, 1),  # Round 62
     (0, 1),  # Round 63
     (0, 1),  # Round 64
-]
+)
 
 # Pre-determined high probability option for each round
-HIGH_PROBABILITY_OPTION = [
+HIGH_PROBABILITY_OPTION = (
     'A', 'A', 'A', 'A', 'A', 'A', 'A', 'A', 'A', 'A', 'A', 'A', 'A', 'A', 'A', 'A',  # Rounds 1-16
     'B', 'B', 'B', 'B', 'B', 'B', 'B', 'B', 'B', 'B', 'B', 'B', 'B', 'B', 'B', 'B', 'B',  # Rounds 17-33
     'A', 'A', 'A', 'A', 'A', 'A', 'A', 'A', 'A', 'A', 'A', 'A', 'A', 'A', 'A',  # Rounds 34-48
     'B', 'B', 'B', 'B', 'B', 'B', 'B', 'B', 'B', 'B', 'B', 'B', 'B', 'B', 'B', 'B'  # Rounds 49-64
-]
+)
+
+# Reversal rounds as a set for constant-time membership checks
+REVERSAL_ROUNDS_SET = frozenset(C.REVERSAL_ROUNDS)
+
+# Group reward field for each option, so rewards are looked up by option instead of branching
+REWARD_FIELDS = {
+    'A': 'round_reward_A',
+    'B': 'round_reward_B',
+}
+
+# Running totals carried from one round to the next
+CUMULATIVE_FIELDS = (
+    'choice1_accuracy_sum',
+    'choice2_accuracy_sum',
+    'choice1_reward_binary_sum',
+    'choice2_reward_binary_sum',
+    'choice1_sum_earnings',
+    'choice2_sum_earnings',
+    'bonus_payment_score',
+)
+
+# Anonymised labels for the other players in a group ("Player 1", "Player 2", ...)
+OTHER_PLAYER_LABELS = tuple(f"Player {i}" for i in range(1, C.PLAYERS_PER_GROUP))
+
+# participant.vars strategy key and the matching session config role suffix
+STRATEGY_ROLES = (
+    ('q_strategy', 'q_role'),
+    ('t_strategy', 't_role'),
+)
+
+
+# Log each round's reward schedule to stdout (set OTREE_DEBUG_TASK=1 when debugging)
+DEBUG_TASK = bool(os.environ.get('OTREE_DEBUG_TASK'))
+
+
+# Earnings sign for an unrewarded (0) or rewarded (1) choice
+REWARD_SIGN = (-1, 1)
+
+
+def compute_earnings(bet, reward):
+    """Points won (+C.POINTS_PER_BET per bet unit) or lost (-C.POINTS_PER_BET per bet unit) for a rewarded/unrewarded choice"""
+    return bet * C.POINTS_PER_BET * REWARD_SIGN[reward]
 
 
 class Subsession(BaseSubsession):
@@ -132,6 +177,8 @@ class Group(BaseGroup):
     # Tracking progress
     all_first_choices_made = models.BooleanField(initial=False)
     all_second_choices_made = models.BooleanField(initial=False)
+    first_choices_count = models.IntegerField(initial=0)   # Number of first decisions submitted this round
+    second_choices_count = models.IntegerField(initial=0)  # Number of second decisions submitted this round
     
     def set_round_rewards(self):
         """Set the rewards for options A and B in the current round"""
@@ -142,34 +189,46 @@ class Group(BaseGroup):
         self.high_probability_option = HIGH_PROBABILITY_OPTION[self.round_number - 1]
         
         # Check if this is a reversal round
-        self.reversal_happened = 1 if self.round_number in C.REVERSAL_ROUNDS else 0
+        self.reversal_happened = 1 if self.round_number in REVERSAL_ROUNDS_SET else 0
         
-        print(f"Round {self.round_number}: Option {self.high_probability_option} has high probability")
-        print(f"Rewards: A = {self.round_reward_A}, B = {self.round_reward_B}")
-        if self.reversal_happened:
-            print(f"REVERSAL occurred at round {self.round_number}")
+        if DEBUG_TASK:
+            print(f"Round {self.round_number}: Option {self.high_probability_option} has high probability")
+            print(f"Rewards: A = {self.round_reward_A}, B = {self.round_reward_B}")
+            if self.reversal_happened:
+                print(f"REVERSAL occurred at round {self.round_number}")
     
-    def get_other_players_first_choices(self, current_player_id):
-        """Get the first choices of all other players in the group"""
-        other_players = [p for p in self.get_players() if p.id_in_group != current_player_id]
-        # Only include players who have made choices
-        return {p.id_in_group: p.field_maybe_none('choice1') for p in other_players}
+    def tally_choices(self, field_name, players=None):
+        """Count each value of a choice field across the group (None for players without a choice)
+        
+        players is the group's get_players() list; fetched here if the caller hasn't already.
+        """
+        if players is None:
+            players = self.get_players()
+        return Counter(player.field_maybe_none(field_name) for player in players)
+    
+    def all_players_have(self, field_name):
+        """Check if every player in the group has a value for the given field"""
+        # Use field_maybe_none to safely check if the field is None; stops at the first missing value
+        return all(player.field_maybe_none(field_name) is not None for player in self.get_players())
     
     def check_all_first_choices_made(self):
-        """Check if all players have made their first choice"""
-        for player in self.get_players():
-            # Use field_maybe_none to safely check if choice1 is None
-            if player.field_maybe_none('choice1') is None:
-                return False
+        """Count a submitted first choice and check if all players have made their first choice"""
+        self.first_choices_count += 1
+        # Only the last chooser needs to look at the players themselves
+        if self.first_choices_count < C.PLAYERS_PER_GROUP:
+            return False
+        if not self.all_players_have('choice1'):
+            return False
         self.all_first_choices_made = True
         return True
     
     def check_all_second_choices_made(self):
-        """Check if all players have made their second choice"""
-        for player in self.get_players():
-            # Use field_maybe_none to safely check if choice2 is None
-            if player.field_maybe_none('choice2') is None:
-                return False
+        """Count a submitted second choice and check if all players have made their second choice"""
+        self.second_choices_count += 1
+        if self.second_choices_count < C.PLAYERS_PER_GROUP:
+            return False
+        if not self.all_players_have('choice2'):
+            return False
         self.all_second_choices_made = True
         return True
 
@@ -209,105 +268,93 @@ class Player(BasePlayer):
     choice2_sum_earnings = models.IntegerField(initial=0)  # Sum of choice2_earnings over trials
     bonus_payment_score = models.IntegerField(initial=0)  # Total bonus points earned
 
-    # Virtual players' choices - First choice (tracking other players)
-    player1_choice_one = models.StringField()
-    player2_choice_one = models.StringField()
-
-    # Virtual players' choices - Second choice
-    player1_choice_two = models.StringField()
-    player2_choice_two = models.StringField()
-
-    # Track accuracy of virtual players' choices - First choice
-    player1_choice1_accuracy = models.BooleanField()
-    player2_choice1_accuracy = models.BooleanField()
-
-    # Track accuracy of virtual players' choices - Second choice
-    player1_choice2_accuracy = models.BooleanField()
-    player2_choice2_accuracy = models.BooleanField()
-
-    # Track whether virtual players gained or lost points
-    player1_loss_or_gain = models.IntegerField()
-    player2_loss_or_gain = models.IntegerField()
+    # Other players' choices, accuracy and outcome, packed into one JSON column.
+    # Keyed by sequential position ('1', '2', ...) with entries of the form
+    # {'c1': choice1, 'c2': choice2, 'acc1': bool, 'acc2': bool, 'log': loss_or_gain}
+    others_choices = models.LongStringField(initial='{}')
 
     def set_model_assignment(self):
         """Set the model assignment based on actual bot status"""
-        participant_code = self.participant.code
+        participant = self.participant
+        participant_vars = participant.vars
+        participant_code = participant.code
         session_config = self.session.config
         
         # Method 1: Check for position-based bot assignment
         position_model_key = f'bot_position_{self.id_in_group}_model'
         if position_model_key in session_config:
-            self.participant.vars['assigned_model'] = session_config[position_model_key]
-            self.participant.vars['is_bot'] = True
+            participant_vars['assigned_model'] = session_config[position_model_key]
+            participant_vars['is_bot'] = True
             print(f"Player {self.id_in_group} (participant {participant_code}): "
-                f"assigned_model={self.participant.vars['assigned_model']} via position, is_bot={self.participant.vars['is_bot']}")
+                f"assigned_model={participant_vars['assigned_model']} via position, is_bot={participant_vars['is_bot']}")
             return
         
         # Method 2: Check intended model for this player position
         intended_model_key = f'player_{self.id_in_group}_intended_model'
         if intended_model_key in session_config:
             intended_model = session_config[intended_model_key]
-            if (hasattr(self.participant, 'label') and self.participant.label and 'bot' in str(self.participant.label).lower()) or \
-            (hasattr(self.participant, 'vars') and 'is_bot' in self.participant.vars and self.participant.vars['is_bot']):
-                self.participant.vars['assigned_model'] = intended_model
-                self.participant.vars['is_bot'] = True
+            if (hasattr(participant, 'label') and participant.label and 'bot' in str(participant.label).lower()) or \
+            participant_vars.get('is_bot'):
+                participant_vars['assigned_model'] = intended_model
+                participant_vars['is_bot'] = True
                 print(f"Player {self.id_in_group} (participant {participant_code}): "
-                    f"assigned_model={self.participant.vars['assigned_model']} via intended model, is_bot={self.participant.vars['is_bot']}")
+                    f"assigned_model={participant_vars['assigned_model']} via intended model, is_bot={participant_vars['is_bot']}")
                 return
         
         # Default: This participant is human
-        self.participant.vars['assigned_model'] = "human"
-        self.participant.vars['is_bot'] = False
+        participant_vars['assigned_model'] = "human"
+        participant_vars['is_bot'] = False
         print(f"Player {self.id_in_group} (participant {participant_code}): "
-            f"assigned_model={self.participant.vars['assigned_model']}, is_bot={self.participant.vars['is_bot']}")
+            f"assigned_model={participant_vars['assigned_model']}, is_bot={participant_vars['is_bot']}")
 
     def set_strategy_assignments(self):
         """Set the strategy assignments based on session config"""
-        # Check for q_role in session config
-        if hasattr(self.session, 'config') and f'player_{self.id_in_group}_q_role' in self.session.config:
-            self.participant.vars['q_strategy'] = self.session.config[f'player_{self.id_in_group}_q_role']
-        else:
-            self.participant.vars['q_strategy'] = ""
+        participant_vars = self.participant.vars
+        session_config = self.session.config
         
-        # Check for t_role in session config
-        if hasattr(self.session, 'config') and f'player_{self.id_in_group}_t_role' in self.session.config:
-            self.participant.vars['t_strategy'] = self.session.config[f'player_{self.id_in_group}_t_role']
-        else:
-            self.participant.vars['t_strategy'] = ""
+        # Copy each player_<id>_<role> entry from the session config, defaulting to no strategy
+        for strategy_key, role_name in STRATEGY_ROLES:
+            participant_vars[strategy_key] = session_config.get(f'player_{self.id_in_group}_{role_name}', "")
         
-        print(f"Player {self.id_in_group}: q_strategy = {self.participant.vars['q_strategy']}, t_strategy = {self.participant.vars['t_strategy']}")
+        print(f"Player {self.id_in_group}: q_strategy = {participant_vars['q_strategy']}, t_strategy = {participant_vars['t_strategy']}")
 
     def set_bot_flag(self):
         """Set the is_bot flag based on participant.label - legacy method, now uses participant.vars"""
+        participant = self.participant
+        participant_vars = participant.vars
+        
         # botex sets participant.label for bots
-        if self.participant.label and 'bot' in self.participant.label.lower():
-            self.participant.vars['is_bot'] = True
+        if participant.label and 'bot' in participant.label.lower():
+            participant_vars['is_bot'] = True
         # Or check if participant was created by botex
-        elif hasattr(self.participant, '_is_bot') and self.participant._is_bot:
-            self.participant.vars['is_bot'] = True
+        elif hasattr(participant, '_is_bot') and participant._is_bot:
+            participant_vars['is_bot'] = True
         # Alternative check using participant vars
-        elif 'is_bot' in self.participant.vars and self.participant.vars['is_bot']:
-            self.participant.vars['is_bot'] = True
+        elif participant_vars.get('is_bot'):
+            participant_vars['is_bot'] = True
         else:
-            self.participant.vars['is_bot'] = False
+            participant_vars['is_bot'] = False
     
-    def calculate_first_choice_social_influence(self):
-        """Calculate the percentage of others who made same/different first choices"""
+    def calculate_first_choice_social_influence(self, choice_tally=None):
+        """Calculate the percentage of others who made same/different first choices
+        
+        choice_tally is the group's Group.tally_choices('choice1'); callers handling the
+        whole group build it once so each player doesn't re-read everyone else's choice.
+        """
         # Get my choice safely using field_maybe_none
         my_choice = self.field_maybe_none('choice1')
         if my_choice is None:
             self.choice1_with = 0
             self.choice1_against = 0
             return
-            
-        other_players = [p for p in self.group.get_players() if p.id_in_group != self.id_in_group]
-        # Only count players who have made choices
-        valid_choices = [p.field_maybe_none('choice1') for p in other_players]
-        valid_choices = [c for c in valid_choices if c is not None]
         
-        same_choice1 = sum(1 for c in valid_choices if c == my_choice)
+        if choice_tally is None:
+            choice_tally = self.group.tally_choices('choice1')
+        
+        # Only count other players who have made choices (exclude my own)
+        total_valid_choices = sum(choice_tally.values()) - choice_tally[None] - 1
+        same_choice1 = choice_tally[my_choice] - 1
         
-        total_valid_choices = len(valid_choices)
         if total_valid_choices > 0:
             self.choice1_with = same_choice1 / total_valid_choices
             self.choice1_against = 1 - self.choice1_with
@@ -315,22 +362,26 @@ class Player(BasePlayer):
             self.choice1_with = 0
             self.choice1_against = 0
 
-    def calculate_second_choice_social_influence(self):
-        """Calculate the percentage of others who made same/different second choices"""
-        other_players = [p for p in self.group.get_players() if p.id_in_group != self.id_in_group]
-        
-        # Only count players who have made a choice
-        valid_other_players = [p for p in other_players if p.choice2 is not None]
+    def calculate_second_choice_social_influence(self, choice_tally=None):
+        """Calculate the percentage of others who made same/different second choices
         
-        # Check if this player has made a choice yet
-        if self.choice2 is None:
+        choice_tally is the group's Group.tally_choices('choice2'), see
+        calculate_first_choice_social_influence.
+        """
+        # Check if this player has made a choice yet, before fetching anyone else
+        my_choice = self.field_maybe_none('choice2')
+        if my_choice is None:
             self.choice2_with = 0
             self.choice2_against = 0
             return
         
-        same_choice2 = sum(1 for p in valid_other_players if p.choice2 == self.choice2)
+        if choice_tally is None:
+            choice_tally = self.group.tally_choices('choice2')
+        
+        # Only count other players who have made a choice (exclude my own)
+        total_valid_players = sum(choice_tally.values()) - choice_tally[None] - 1
+        same_choice2 = choice_tally[my_choice] - 1
         
-        total_valid_players = len(valid_other_players)
         if total_valid_players > 0:
             self.choice2_with = same_choice2 / total_valid_players
             self.choice2_against = 1 - self.choice2_with
@@ -338,97 +389,84 @@ class Player(BasePlayer):
             self.choice2_with = 0
             self.choice2_against = 0
     
-    def calculate_choice1_earnings(self):
-        """Calculate earnings for first choice"""
-        # Ensure group rewards are set for this round if not already set
-        if self.group.field_maybe_none('round_reward_A') is None or self.group.field_maybe_none('round_reward_B') is None:
-            self.group.set_round_rewards()
+    def calculate_round_earnings(self):
+        """Calculate earnings for both choices in one pass over the group rewards"""
+        group = self.group
+        # Read each option's reward once, ensuring group rewards are set for this round if not already set
+        option_rewards = {option: group.field_maybe_none(field) for option, field in REWARD_FIELDS.items()}
+        if None in option_rewards.values():
+            group.set_round_rewards()
+            option_rewards = {option: getattr(group, field) for option, field in REWARD_FIELDS.items()}
             
-        # For choice1, see if it would have been rewarded
-        if self.choice1 == 'A':
-            choice1_reward = self.group.round_reward_A
-        else:  # 'B'
-            choice1_reward = self.group.round_reward_B
-                
-        # Set binary reward outcome
+        # For choice1, see if it would have been rewarded (not shown to player)
+        choice1_reward = option_rewards[self.choice1]
         self.choice1_reward_binary = choice1_reward
-            
-        # Calculate earnings
-        if choice1_reward == 1:  # Would have been rewarded
-            self.choice1_earnings = self.bet1 * 20  # Positive points
-        else:  # Would not have been rewarded
-            self.choice1_earnings = -1 * self.bet1 * 20  # Negative points
-    
-    def calculate_choice2_earnings(self):
-        """Calculate earnings for second choice"""
-        # Ensure group rewards are set for this round if not already set
-        if self.group.field_maybe_none('round_reward_A') is None or self.group.field_maybe_none('round_reward_B') is None:
-            self.group.set_round_rewards()
-            
-        # For choice2, calculate reward
-        if self.choice2 == 'A':
-            self.trial_reward = self.group.round_reward_A
-        else:  # 'B'
-            self.trial_reward = self.group.round_reward_B
+        self.choice1_earnings = compute_earnings(self.bet1, choice1_reward)
         
-        # Set binary reward outcome
+        # For choice2, calculate reward
+        self.trial_reward = option_rewards[self.choice2]
         self.choice2_reward_binary = self.trial_reward
+        self.choice2_earnings = compute_earnings(self.bet2, self.trial_reward)
         
-        # Calculate earnings
-        if self.trial_reward == 1:  # Option was rewarded
-            self.choice2_earnings = self.bet2 * 20  # Positive points
-        else:  # Option was not rewarded
-            self.choice2_earnings = -1 * self.bet2 * 20  # Negative points
-        
-        # Set whether the player gained or lost points
-        self.loss_or_gain = 1 if self.choice2_earnings > 0 else -1
+        # Set whether the player gained or lost points (bets are always positive)
+        self.loss_or_gain = REWARD_SIGN[self.trial_reward]
     
     def update_cumulative_sums(self):
         """Update all cumulative sums across rounds"""
+        participant_vars = self.participant.vars
         if self.round_number == 1:
-            # First round - initialize all sums with current values
-            self.choice1_accuracy_sum = int(self.choice1_accuracy)
-            self.choice2_accuracy_sum = int(self.choice2_accuracy)
-            self.choice1_reward_binary_sum = self.choice1_reward_binary
-            self.choice2_reward_binary_sum = self.choice2_reward_binary
-            self.choice1_sum_earnings = self.choice1_earnings
-            self.choice2_sum_earnings = self.choice2_earnings
-            self.bonus_payment_score = self.choice2_earnings  # Initialize with second choice earnings
+            # First round - sums start from zero
+            previous = dict.fromkeys(CUMULATIVE_FIELDS, 0)
         else:
-            # Subsequent rounds - add current values to previous sums
-            previous_player = self.in_round(self.round_number - 1)
-            self.choice1_accuracy_sum = previous_player.choice1_accuracy_sum + int(self.choice1_accuracy)
-            self.choice2_accuracy_sum = previous_player.choice2_accuracy_sum + int(self.choice2_accuracy)
-            self.choice1_reward_binary_sum = previous_player.choice1_reward_binary_sum + self.choice1_reward_binary
-            self.choice2_reward_binary_sum = previous_player.choice2_reward_binary_sum + self.choice2_reward_binary
-            self.choice1_sum_earnings = previous_player.choice1_sum_earnings + self.choice1_earnings
-            self.choice2_sum_earnings = previous_player.choice2_sum_earnings + self.choice2_earnings
-            self.bonus_payment_score = previous_player.bonus_payment_score + self.choice2_earnings
+            # Subsequent rounds - read previous sums from the participant-level cache
+            # instead of querying the previous round when possible
+            previous = participant_vars.get('prev_cumulative')
+            if previous is None or previous['round_number'] != self.round_number - 1:
+                previous_player = self.in_round(self.round_number - 1)
+                previous = {field: getattr(previous_player, field) for field in CUMULATIVE_FIELDS}
+        
+        # Add current values to previous sums
+        self.choice1_accuracy_sum = previous['choice1_accuracy_sum'] + int(self.choice1_accuracy)
+        self.choice2_accuracy_sum = previous['choice2_accuracy_sum'] + int(self.choice2_accuracy)
+        self.choice1_reward_binary_sum = previous['choice1_reward_binary_sum'] + self.choice1_reward_binary
+        self.choice2_reward_binary_sum = previous['choice2_reward_binary_sum'] + self.choice2_reward_binary
+        self.choice1_sum_earnings = previous['choice1_sum_earnings'] + self.choice1_earnings
+        self.choice2_sum_earnings = previous['choice2_sum_earnings'] + self.choice2_earnings
+        self.bonus_payment_score = previous['bonus_payment_score'] + self.choice2_earnings  # Second choice earnings only
+        
+        # Cache this round's sums for the next round's update
+        prev_cumulative = {field: getattr(self, field) for field in CUMULATIVE_FIELDS}
+        prev_cumulative['round_number'] = self.round_number
+        participant_vars['prev_cumulative'] = prev_cumulative
+    
+    def choice_summary(self):
+        """This player's choices, accuracy and outcome as stored in other players' others_choices"""
+        entry = {}
+        choice1 = self.field_maybe_none('choice1')
+        if choice1 is not None:
+            entry['c1'] = choice1
+        choice2 = self.field_maybe_none('choice2')
+        if choice2 is not None:
+            entry['c2'] = choice2
+            entry['acc1'] = self.choice1_accuracy
+            entry['acc2'] = self.choice2_accuracy
+            entry['log'] = self.loss_or_gain
+        return entry
     
-    def save_other_players_data(self):
-        """Save data about other players in the group"""
-        # Get other players
-        other_players = [p for p in self.group.get_players() if p.id_in_group != self.id_in_group]
-        
-        # Save data for up to 2 other players (since groups of 3)
-        for i, p in enumerate(other_players):
-            if i == 0:  # First player
-                if p.choice1 is not None:
-                    self.player1_choice_one = p.choice1
-                if p.choice2 is not None:
-                    self.player1_choice_two = p.choice2
-                    self.player1_choice1_accuracy = p.choice1_accuracy
-                    self.player1_choice2_accuracy = p.choice2_accuracy
-                    self.player1_loss_or_gain = p.loss_or_gain
-                    
-            elif i == 1:  # Second player
-                if p.choice1 is not None:
-                    self.player2_choice_one = p.choice1
-                if p.choice2 is not None:
-                    self.player2_choice_two = p.choice2
-                    self.player2_choice1_accuracy = p.choice1_accuracy
-                    self.player2_choice2_accuracy = p.choice2_accuracy
-                    self.player2_loss_or_gain = p.loss_or_gain
+    def save_other_players_data(self, summaries=None):
+        """Save data about other players in the group
+        
+        summaries maps id_in_group to choice_summary() and can be built once per group
+        by the caller so every player reuses the same records.
+        """
+        if summaries is None:
+            summaries = {p.id_in_group: p.choice_summary() for p in self.group.get_players()}
+        
+        others_choices = {}
+        for i, other_id in enumerate((pid for pid in summaries if pid != self.id_in_group), start=1):
+            others_choices[str(i)] = summaries[other_id]
+        
+        self.others_choices = json.dumps(others_choices)
 
 
 # PAGES
@@ -442,6 +480,13 @@ class GroupingWaitPage(WaitPage):
     @staticmethod
     def is_displayed(player):
         return player.round_number == 1
+    
+    @staticmethod
+    def after_all_players_arrive(group):
+        # Grouping by arrival time replaces the groups made in creating_session in every round,
+        # so set the reward schedule on the newly formed group for all of its rounds
+        for round_group in group.in_rounds(group.round_number, C.NUM_ROUNDS):
+            round_group.set_round_rewards()
 
 
 class FirstDecisions(Page):
@@ -450,10 +495,7 @@ class FirstDecisions(Page):
     
     @staticmethod
     def vars_for_template(player):
-        # Ensure group rewards are set for this round
-        if player.round_number > 1:
-            player.group.set_round_rewards()
-        
+        # Group rewards for every round are set when the group is formed on GroupingWaitPage
         return {
             'round_number': player.round_number,
         }
@@ -481,11 +523,12 @@ class FirstDecisionsWaitPage(WaitPage):
         # Update group-level tracking first
         group.all_first_choices_made = True
         
-        # Then calculate social influence for each player
-        for player in group.get_players():
-            # Skip any calculations for players without choices (shouldn't happen if wait page works correctly)
-            if player.field_maybe_none('choice1') is not None:
-                player.calculate_first_choice_social_influence()
+        # Then calculate social influence for each player (players without a choice,
+        # which shouldn't happen if the wait page works correctly, are zeroed by the method itself)
+        players = group.get_players()
+        choice_tally = group.tally_choices('choice1', players)
+        for player in players:
+            player.calculate_first_choice_social_influence(choice_tally)
 
 
 class SecondDecisions(Page):
@@ -501,35 +544,31 @@ class SecondDecisions(Page):
     def vars_for_template(player):
         # Get the first choices of all other players
         other_players_choices = {}
-        other_player_index = 1  # Start with Player 1
         
-        for p in player.group.get_players():
-            if p.id_in_group != player.id_in_group:
-                # Use field_maybe_none for safety
-                choice = p.field_maybe_none('choice1')
-                if choice is not None:
-                    # Use sequential numbering instead of actual player IDs
-                    other_players_choices[f"Player {other_player_index}"] = choice
-                    other_player_index += 1
+        for p in player.get_others_in_group():
+            # Use field_maybe_none for safety
+            choice = p.field_maybe_none('choice1')
+            if choice is not None:
+                # Use sequential numbering instead of actual player IDs
+                other_players_choices[OTHER_PLAYER_LABELS[len(other_players_choices)]] = choice
         
         return {
             'round_number': player.round_number,
-            'choice1': player.field_maybe_none('choice1'),
-            'bet1': player.field_maybe_none('bet1'),
+            # is_displayed guarantees the first decision form was submitted
+            'choice1': player.choice1,
+            'bet1': player.bet1,
             'other_players_choices': other_players_choices,
         }
     
     @staticmethod
     def before_next_page(player, timeout_happened):
-        # Calculate earnings for first choice (not shown to player)
-        player.calculate_choice1_earnings()
-        
-        # Calculate earnings for second choice
-        player.calculate_choice2_earnings()
+        # Calculate earnings for both choices
+        player.calculate_round_earnings()
         
         # Update accuracy metrics
-        player.choice1_accuracy = (player.choice1 == player.group.high_probability_option)
-        player.choice2_accuracy = (player.choice2 == player.group.high_probability_option)
+        high_probability_option = player.group.high_probability_option
+        player.choice1_accuracy = (player.choice1 == high_probability_option)
+        player.choice2_accuracy = (player.choice2 == high_probability_option)
         
         # Update all cumulative sums
         player.update_cumulative_sums()
@@ -550,12 +589,17 @@ class SecondDecisionsWaitPage(WaitPage):
     # Update SecondDecisionsWaitPage similarly
     @staticmethod
     def after_all_players_arrive(group):
+        players = group.get_players()
+        # Summarise each player once rather than once per other player in the group
+        summaries = {p.id_in_group: p.choice_summary() for p in players}
+        choice_tally = group.tally_choices('choice2', players)
+        
         # Calculate social influence for second choices for players who have made choices
-        for player in group.get_players():
+        for player in players:
             if player.choice2 is not None:
-                player.calculate_second_choice_social_influence()
+                player.calculate_second_choice_social_influence(choice_tally)
                 # Save other players' data for later analysis
-                player.save_other_players_data()
+                player.save_other_players_data(summaries)
 
 
 class RoundResults(Page):
@@ -566,15 +610,12 @@ class RoundResults(Page):
         
         # Get the second choices of all players with sequential numbering
         all_players_results = {}
-        other_player_index = 1  # Start with Player 1
         
-        for p in player.group.get_players():
-            if p.id_in_group != player.id_in_group:
-                all_players_results[f"Player {other_player_index}"] = {
-                    'choice': p.choice2,
-                    'outcome': 'Correct' if p.trial_reward == 1 else 'Incorrect'
-                }
-                other_player_index += 1
+        for label, p in zip(OTHER_PLAYER_LABELS, player.get_others_in_group()):
+            all_players_results[label] = {
+                'choice': p.choice2,
+                'outcome': 'Correct' if p.trial_reward == 1 else 'Incorrect'
+            }
         
         return {
             'round_number': player.round_number,
@@ -605,21 +646,24 @@ class FinalResults(Page):
     
     @staticmethod
     def before_next_page(player, timeout_happened):
-        # Store cumulative data in participant vars for use in subsequent apps
-        player.participant.vars['choice1_sum_earnings'] = player.choice1_sum_earnings
-        player.participant.vars['choice2_sum_earnings'] = player.choice2_sum_earnings
-        player.participant.vars['choice1_accuracy_sum'] = player.choice1_accuracy_sum
-        player.participant.vars['choice2_accuracy_sum'] = player.choice2_accuracy_sum
-        player.participant.vars['choice1_reward_binary_sum'] = player.choice1_reward_binary_sum
-        player.participant.vars['choice2_reward_binary_sum'] = player.choice2_reward_binary_sum
-        player.participant.vars['bonus_payoff'] = cu(max(0, player.bonus_payment_score / 600))
-        player.participant.finished = True
+        participant = player.participant
+        # Store cumulative data in participant vars for use in subsequent apps (single batched update)
+        participant.vars.update(
+            choice1_sum_earnings=player.choice1_sum_earnings,
+            choice2_sum_earnings=player.choice2_sum_earnings,
+            choice1_accuracy_sum=player.choice1_accuracy_sum,
+            choice2_accuracy_sum=player.choice2_accuracy_sum,
+            choice1_reward_binary_sum=player.choice1_reward_binary_sum,
+            choice2_reward_binary_sum=player.choice2_reward_binary_sum,
+            bonus_payoff=cu(max(0, player.bonus_payment_score / C.BONUS_POINTS_DIVISOR)),
+        )
+        participant.finished = True
     
     @staticmethod
     def vars_for_template(player):
         return {
             'bonus_payment_score': player.bonus_payment_score,
-            'bonus_payoff': cu(max(0, player.bonus_payment_score / 600)),
+            'bonus_payoff': cu(max(0, player.bonus_payment_score / C.BONUS_POINTS_DIVISOR)),
         }
 
 